@@ -0,0 +1,221 @@
+# Standard imports
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from typing import List, Optional, Sequence, Set, Tuple
+
+# Local imports
+import sharded_download
+from sharded_download import download_sharded
+
+# Define default benchmark values as constants
+BENCHMARK_PIECE_LENGTH = 262144
+BENCHMARK_NUM_PIECES = 64
+BENCHMARK_NUM_PEERS = 8
+BENCHMARK_LATENCY = 0.02  # Seconds each fake peer waits before answering a request
+BENCHMARK_WORKERS = (1, 2, 4)
+BENCHMARK_OUTSTANDING = (1, 5)
+PEER_OK = "ok"
+PEER_CORRUPT = "corrupt"  # Answers every request with zeroed blocks
+PEER_HANGUP = "hangup"  # Closes the connection right after its bitfield
+
+
+def _message(message_id: int, payload: bytes = b"") -> bytes:
+    return (len(payload) + 1).to_bytes(4, byteorder="big") + bytes([message_id]) + payload
+
+
+async def _serve_peer(
+    content: bytes,
+    piece_length: int,
+    pieces: Set[int],
+    mode: str,
+    latency: float,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    """
+    Plays one seeding peer: sends its bitfield, then answers each block
+    request after 'latency' seconds without waiting for earlier answers.
+    """
+    num_pieces = -(-len(content) // piece_length)
+    bitfield = bytearray(-(-num_pieces // 8))
+    for i in pieces:
+        bitfield[i // 8] |= 0x80 >> (i % 8)
+    writer.write(_message(5, bytes(bitfield)))
+    if mode == PEER_HANGUP:
+        await writer.drain()
+        writer.close()
+        return
+
+    loop = asyncio.get_running_loop()
+
+    def send(reply: bytes) -> None:
+        if not writer.is_closing():
+            writer.write(reply)
+
+    try:
+        while True:
+            length = int.from_bytes(await reader.readexactly(4), byteorder="big")
+            if length == 0:
+                continue  # Keep-alive
+            message = await reader.readexactly(length)
+            if message[0] != 6 or length != 13:
+                continue  # Not a 'request' message
+            index = int.from_bytes(message[1:5], byteorder="big")
+            begin = int.from_bytes(message[5:9], byteorder="big")
+            block_length = int.from_bytes(message[9:13], byteorder="big")
+            start = index * piece_length + begin
+            block = content[start : start + block_length]
+            if mode == PEER_CORRUPT:
+                block = bytes(len(block))
+            loop.call_later(latency, send, _message(7, message[1:9] + block))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+
+
+def _run_peers(
+    content: bytes,
+    piece_length: int,
+    peers: Sequence[Tuple[Set[int], str]],
+    latency: float,
+    ports_pipe,
+) -> None:
+    async def serve() -> None:
+        servers = []
+        for pieces, mode in peers:
+            servers.append(
+                await asyncio.start_server(
+                    lambda r, w, pieces=pieces, mode=mode: _serve_peer(
+                        content, piece_length, pieces, mode, latency, r, w
+                    ),
+                    "127.0.0.1",
+                    0,
+                )
+            )
+        ports_pipe.send([server.sockets[0].getsockname()[1] for server in servers])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class FakePeers:
+    """
+    Loopback peers seeding 'content', served from a separate process.
+
+    Used as a context manager that returns the peers as (ip, port) tuples.
+    """
+
+    def __init__(
+        self,
+        content: bytes,
+        piece_length: int,
+        peer_pieces: Sequence[Optional[Set[int]]],
+        modes: Optional[Sequence[str]] = None,
+        latency: float = 0.0,
+    ):
+        """
+        Args:
+            content: The torrent's data.
+            piece_length: The 'piece length' of the torrent in bytes.
+            peer_pieces: The pieces each peer has; None means every piece.
+            modes: PEER_OK, PEER_CORRUPT or PEER_HANGUP for each peer.
+                   Defaults to PEER_OK for all of them.
+            latency: Seconds each peer waits before answering a request.
+        """
+        num_pieces = -(-len(content) // piece_length)
+        self.content = content
+        self.piece_length = piece_length
+        self.peers = [
+            (set(range(num_pieces)) if pieces is None else set(pieces), mode)
+            for pieces, mode in zip(peer_pieces, modes or [PEER_OK] * len(peer_pieces))
+        ]
+        self.latency = latency
+        self._process: Optional[multiprocessing.Process] = None
+
+    def __enter__(self) -> List[Tuple[str, int]]:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_run_peers,
+            args=(self.content, self.piece_length, self.peers, self.latency, sender),
+            daemon=True,
+        )
+        self._process.start()
+        return [("127.0.0.1", port) for port in receiver.recv()]
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.join()
+
+
+async def connect_to_fake_peer(
+    peer_ip: str, peer_port: int, info_hash: bytes, *args, **kwargs
+) -> Tuple[Optional[asyncio.StreamReader], Optional[asyncio.StreamWriter]]:
+    """
+    Stands in for 'connect_to_peer': opens a TCP connection without the
+    BitTorrent handshake, which the fake peers do not expect.
+    """
+    try:
+        return await asyncio.open_connection(peer_ip, peer_port)
+    except OSError as e:
+        print(f"Failed to connect to {peer_ip}:{peer_port}: {e!r}")
+        return None, None
+
+
+def main():
+    """
+    Times 'download_sharded' against loopback peers with simulated latency,
+    for several numbers of worker processes and of outstanding block requests.
+    """
+    multiprocessing.set_start_method("fork")  # Workers inherit the patched connect
+    sharded_download.connect_to_peer = connect_to_fake_peer
+
+    content = random.Random(0).randbytes(BENCHMARK_PIECE_LENGTH * BENCHMARK_NUM_PIECES)
+    piece_hashes = [
+        hashlib.sha1(content[i : i + BENCHMARK_PIECE_LENGTH]).digest()
+        for i in range(0, len(content), BENCHMARK_PIECE_LENGTH)
+    ]
+    print(
+        f"{len(content) // 2**20} MiB, {BENCHMARK_NUM_PEERS} peers, "
+        f"{BENCHMARK_LATENCY * 1000:.0f} ms latency, {os.cpu_count()} CPU cores"
+    )
+
+    results = []
+    with FakePeers(
+        content,
+        BENCHMARK_PIECE_LENGTH,
+        [None] * BENCHMARK_NUM_PEERS,
+        latency=BENCHMARK_LATENCY,
+    ) as peer_list, tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "benchmark.bin")
+        for outstanding in BENCHMARK_OUTSTANDING:
+            sharded_download.MAX_OUTSTANDING_REQUESTS = outstanding
+            for num_workers in BENCHMARK_WORKERS:
+                started = time.monotonic()
+                bitfield = download_sharded(
+                    peer_list,
+                    bytes(20),
+                    BENCHMARK_PIECE_LENGTH,
+                    len(content),
+                    output_path,
+                    piece_hashes,
+                    num_workers,
+                )
+                elapsed = time.monotonic() - started
+                with open(output_path, "rb") as f:
+                    complete = all(bitfield) and f.read() == content
+                results.append((outstanding, num_workers, elapsed, complete))
+
+    print("outstanding  workers  seconds   MiB/s  complete")
+    for outstanding, num_workers, elapsed, complete in results:
+        print(
+            f"{outstanding:>11}  {num_workers:>7}  {elapsed:>7.2f}  "
+            f"{len(content) / 2**20 / elapsed:>6.1f}  {complete}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,34 @@
 # Standard imports
 import asyncio
 import random
-from typing import Optional
+from typing import Optional, Set, Tuple
 
 # Local imports
 from torrent_parser import parse_torrent
 from tracker_request import get_peers
-from peer_handshake import perform_handshake
+from peer_handshake import connect_to_peer
 
 
 # Define default timeout values as constants
 MAX_PEER_CONNECTIONS = 2  # Set to -1 to try all peers
 PIECE_RESPONSE_PREFIX_TIMEOUT = 25
 PIECE_DATA_TIMEOUT = 40
+BITFIELD_TIMEOUT = 10
+BLOCK_SIZE = 16384
+MAX_OUTSTANDING_REQUESTS = 5  # Block requests kept in flight per connection
 
 
 async def request_piece(
     reader: asyncio.StreamReader,
     writer: asyncio.StreamWriter,
     piece_index: int,
+    block_offset: int = 0,
+    block_length: int = BLOCK_SIZE,
     piece_prefix_timeout: float = PIECE_RESPONSE_PREFIX_TIMEOUT,
     piece_data_timeout: float = PIECE_DATA_TIMEOUT,
 ) -> Optional[bytes]:
     """
-    Requests and downloads a specific piece of data from a connected peer.
+    Requests and downloads a block of a specific piece from a connected peer.
 
     Sends a 'request' message to the peer for the given piece index and then
     attempts to read the corresponding piece data. Handles timeouts during the
@@ -33,6 +38,10 @@ async def request_piece(
         reader: The asyncio StreamReader object for reading from the peer.
         writer: The asyncio StreamWriter object for writing to the peer.
         piece_index: The index of the piece to request (integer).
+        block_offset: The offset of the block within the piece (integer).
+                      Defaults to 0.
+        block_length: The length of the block to request (integer).
+                      Defaults to BLOCK_SIZE.
         piece_prefix_timeout: Timeout in seconds to wait for the initial 4-byte
                               length prefix of the response (float).
                               Defaults to PIECE_RESPONSE_PREFIX_TIMEOUT.
@@ -54,8 +63,8 @@ async def request_piece(
         # - length_prefix: 4 bytes, integer, big-endian. The length of the remaining payload (13).
         # - message_id: 1 byte, integer. The message ID for 'request' is 6.
         # - index: 4 bytes, integer, big-endian. The index of the piece being requested (use the 'piece_index' function argument).
-        # - begin: 4 bytes, integer, big-endian. The starting offset within the piece (always 0 for simplicity).
-        # - length: 4 bytes, integer, big-endian. The length of the block being requested (16384 for simplicity).
+        # - begin: 4 bytes, integer, big-endian. The starting offset within the piece (use the 'block_offset' function argument).
+        # - length: 4 bytes, integer, big-endian. The length of the block being requested (use the 'block_length' function argument).
         # Construct the 'request_msg' by concatenating these components.
         # Remember to convert integers to bytes using .to_bytes(4, byteorder='big') for multi-byte fields and .to_bytes(1, byteorder='big') for the message ID.
         # Assign the resulting bytes object to the 'request_msg' variable.
@@ -124,6 +133,165 @@ async def request_piece(
         return None
 
 
+async def read_message(
+    reader: asyncio.StreamReader, timeout: float
+) -> Optional[Tuple[int, bytes]]:
+    """
+    Reads one length-prefixed peer wire message.
+
+    Args:
+        reader: The asyncio StreamReader object for reading from the peer.
+        timeout: Timeout in seconds to wait for each part of the message.
+
+    Returns:
+        A (message_id, payload) tuple, or None for a keep-alive message.
+
+    Raises:
+        asyncio.TimeoutError: If the peer sends nothing within 'timeout'.
+        asyncio.IncompleteReadError: If the peer closes the connection.
+    """
+    length_prefix = await asyncio.wait_for(reader.readexactly(4), timeout)
+    message_length = int.from_bytes(length_prefix, byteorder="big")
+    if message_length == 0:
+        return None
+    message = await asyncio.wait_for(reader.readexactly(message_length), timeout)
+    return message[0], message[1:]
+
+
+def _request_message(piece_index: int, begin: int, length: int) -> bytes:
+    return (
+        (13).to_bytes(4, byteorder="big")
+        + (6).to_bytes(1, byteorder="big")
+        + piece_index.to_bytes(4, byteorder="big")
+        + begin.to_bytes(4, byteorder="big")
+        + length.to_bytes(4, byteorder="big")
+    )
+
+
+async def request_full_piece(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    piece_index: int,
+    piece_length: int,
+    max_outstanding: int = MAX_OUTSTANDING_REQUESTS,
+    timeout: float = PIECE_DATA_TIMEOUT,
+    peer_have: Optional[Set[int]] = None,
+) -> Optional[bytes]:
+    """
+    Downloads a whole piece from a peer, block by block.
+
+    Keeps up to 'max_outstanding' block requests in flight. Each reply is
+    matched to a request by its piece index and offset; keep-alives and other
+    messages arriving between the blocks are skipped ('have' messages are
+    added to 'peer_have').
+
+    Args:
+        reader: The asyncio StreamReader object for reading from the peer.
+        writer: The asyncio StreamWriter object for writing to the peer.
+        piece_index: The index of the piece to download.
+        piece_length: The length of this piece in bytes (the last piece of a
+                      torrent is usually shorter than the others).
+        max_outstanding: Number of block requests to keep in flight, so that
+                         throughput is not limited to one block per round
+                         trip. Defaults to MAX_OUTSTANDING_REQUESTS.
+        timeout: Timeout in seconds to wait for each message from the peer.
+                 Defaults to PIECE_DATA_TIMEOUT.
+        peer_have: Optional set of piece indices the peer has, updated from
+                   the 'have' messages received.
+
+    Returns:
+        The piece data as bytes if every block arrived with its full length,
+        otherwise None.
+    """
+    block_offsets = list(range(0, piece_length, BLOCK_SIZE))
+    piece = bytearray(piece_length)
+    received: Set[int] = set()
+    requested = 0
+
+    try:
+        while len(received) < len(block_offsets):
+            while (
+                requested < len(block_offsets)
+                and requested - len(received) < max_outstanding
+            ):
+                begin = block_offsets[requested]
+                block_length = min(BLOCK_SIZE, piece_length - begin)
+                writer.write(_request_message(piece_index, begin, block_length))
+                requested += 1
+            await writer.drain()
+
+            message = await read_message(reader, timeout)
+            if message is None:
+                continue  # Keep-alive
+            message_id, payload = message
+            if message_id == 4 and len(payload) == 4 and peer_have is not None:
+                peer_have.add(int.from_bytes(payload, byteorder="big"))
+            if message_id != 7 or len(payload) < 8:
+                continue  # Not a 'piece' message
+
+            index = int.from_bytes(payload[0:4], byteorder="big")
+            begin = int.from_bytes(payload[4:8], byteorder="big")
+            block = payload[8:]
+            if (
+                index != piece_index
+                or begin % BLOCK_SIZE
+                or begin >= piece_length
+                or begin in received
+                or len(block) != min(BLOCK_SIZE, piece_length - begin)
+            ):
+                continue  # A stale or unexpected block
+            piece[begin : begin + len(block)] = block
+            received.add(begin)
+
+        return bytes(piece)
+
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as e:
+        print(f"Failed to download piece {piece_index}: {e!r}")
+        return None
+
+
+async def read_bitfield(
+    reader: asyncio.StreamReader,
+    num_pieces: int,
+    timeout: float = BITFIELD_TIMEOUT,
+) -> Set[int]:
+    """
+    Reads the pieces a peer has from the messages it sends after the handshake.
+
+    Consumes 'have' (ID 4) messages and keep-alives until the peer's 'bitfield'
+    (ID 5) message, any other message, or the timeout.
+
+    Args:
+        reader: The asyncio StreamReader object for reading from the peer.
+        num_pieces: The number of pieces in the torrent.
+        timeout: Timeout in seconds to wait for each message.
+                 Defaults to BITFIELD_TIMEOUT.
+
+    Returns:
+        The set of piece indices the peer announced. Empty if it announced none.
+    """
+    have: Set[int] = set()
+    try:
+        while True:
+            message = await read_message(reader, timeout)
+            if message is None:
+                continue  # Keep-alive
+            message_id, payload = message
+            if message_id == 4 and len(payload) == 4:
+                have.add(int.from_bytes(payload, byteorder="big"))
+                continue
+            if message_id == 5:
+                have.update(
+                    i
+                    for i in range(min(num_pieces, len(payload) * 8))
+                    if payload[i // 8] & (0x80 >> (i % 8))
+                )
+            return have
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        print(f"Stopped reading bitfield: {e!r}")
+        return have
+
+
 async def download_piece(
     reader: asyncio.StreamReader,
     writer: asyncio.StreamWriter,
@@ -175,8 +343,8 @@ async def main():
             print(
                 f"Attempting handshake with {peer_ip}:{peer_port} (Peer {i+1}/{peers_to_try})"
             )
-            handshake_result = await perform_handshake(peer_ip, peer_port, info_hash)
-            if handshake_result:
+            handshake_result = await connect_to_peer(peer_ip, peer_port, info_hash)
+            if all(handshake_result):
                 reader, writer = handshake_result
                 print(f"Handshake successful with {peer_ip}:{peer_port}")
                 piece = await download_piece(reader, writer, piece_index=0)
@@ -7,11 +7,13 @@ from typing import Optional, Tuple
 # Local imports
 from torrent_parser import parse_torrent
 from tracker_request import get_peers
+from utp_transport import open_utp_connection
 
 # Define default attempt/timeout values as constants
 MAX_ATTEMPTS = 2
 CONNECT_TIMEOUT = 15
 HANDSHAKE_RESPONSE_TIMEOUT = 20
+UTP_FALLBACK = True  # Retry over uTP when the TCP handshake fails
 
 
 async def perform_handshake(
@@ -20,13 +22,14 @@ async def perform_handshake(
     info_hash: bytes,
     connect_timeout: float = CONNECT_TIMEOUT,
     handshake_timeout: float = HANDSHAKE_RESPONSE_TIMEOUT,
+    use_utp: bool = False,
 ) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
     """
     Performs the BitTorrent handshake with a peer.
 
-    Establishes a TCP connection with the peer, sends the BitTorrent handshake
-    message, and waits for the peer's handshake response. It verifies if the
-    received info hash matches the expected one.
+    Establishes a TCP (or uTP) connection with the peer, sends the BitTorrent
+    handshake message, and waits for the peer's handshake response. It verifies
+    if the received info hash matches the expected one.
 
     Args:
         peer_ip: The IP address of the peer.
@@ -36,6 +39,7 @@ async def perform_handshake(
                          Defaults to CONNECT_TIMEOUT.
         handshake_timeout: Timeout in seconds for receiving the peer's handshake
                            response. Defaults to HANDSHAKE_RESPONSE_TIMEOUT.
+        use_utp: Connect over uTP (BEP 29) instead of TCP. Defaults to False.
 
     Returns:
         A tuple containing the asyncio StreamReader and StreamWriter objects
@@ -50,30 +54,37 @@ async def perform_handshake(
     try:
         print(f"Attempting handshake with {peer_ip}:{peer_port}")
 
-        # --- Task 3.1: Create a TCP socket ---
-        # Create a socket object using socket.socket() for IPv4 (AF_INET) and TCP (SOCK_STREAM).
-        sock = None # YOUR CODE HERE
-        if sock is None:
-            raise NotImplementedError("Task 3.1: Creating the TCP socket is not implemented.")
-        sock.settimeout(connect_timeout)
-        print("Socket created.")
-
-        # --- Task 3.2: Connect to the peer ---
-        # Use asyncio.get_event_loop().sock_connect() to asynchronously connect the socket
-        # to the peer's IP address and port.
-        try:
-            pass # YOUR CODE HERE
-            print("Socket connected.")
-        except OSError as e:
-            print(f"Socket connect error: {e}")
-            return None, None
-
-        # --- Task 3.3: Open asyncio streams ---
-        # Use asyncio.open_connection() with the socket to get asyncio StreamReader and StreamWriter.
-        reader, writer = None, None # YOUR CODE HERE
-        if reader is None or writer is None:
-            raise NotImplementedError("Task 3.3: Opening asyncio connection is not fully implemented.")
-        print("asyncio connection opened.")
+        if use_utp:
+            # uTP gives the same StreamReader/StreamWriter pair over UDP.
+            reader, writer = await open_utp_connection(
+                peer_ip, peer_port, connect_timeout
+            )
+            print("uTP connection opened.")
+        else:
+            # --- Task 3.1: Create a TCP socket ---
+            # Create a socket object using socket.socket() for IPv4 (AF_INET) and TCP (SOCK_STREAM).
+            sock = None # YOUR CODE HERE
+            if sock is None:
+                raise NotImplementedError("Task 3.1: Creating the TCP socket is not implemented.")
+            sock.settimeout(connect_timeout)
+            print("Socket created.")
+
+            # --- Task 3.2: Connect to the peer ---
+            # Use asyncio.get_event_loop().sock_connect() to asynchronously connect the socket
+            # to the peer's IP address and port.
+            try:
+                pass # YOUR CODE HERE
+                print("Socket connected.")
+            except OSError as e:
+                print(f"Socket connect error: {e}")
+                return None, None
+
+            # --- Task 3.3: Open asyncio streams ---
+            # Use asyncio.open_connection() with the socket to get asyncio StreamReader and StreamWriter.
+            reader, writer = None, None # YOUR CODE HERE
+            if reader is None or writer is None:
+                raise NotImplementedError("Task 3.3: Opening asyncio connection is not fully implemented.")
+            print("asyncio connection opened.")
 
         # --- Task 3.4: Construct the handshake message ---
         # The handshake message is 68 bytes long and has the following structure:
@@ -145,6 +156,54 @@ async def perform_handshake(
                 print(f"Error closing writer: {e}")
 
 
+async def connect_to_peer(
+    peer_ip: str,
+    peer_port: int,
+    info_hash: bytes,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    handshake_timeout: float = HANDSHAKE_RESPONSE_TIMEOUT,
+    utp_fallback: bool = UTP_FALLBACK,
+) -> Tuple[Optional[asyncio.StreamReader], Optional[asyncio.StreamWriter]]:
+    """
+    Performs the BitTorrent handshake over TCP and, if that fails, over uTP.
+
+    Many peers are only reachable over uTP, so callers that just need a
+    connection should use this rather than 'perform_handshake'.
+
+    Args:
+        peer_ip: The IP address of the peer.
+        peer_port: The port number of the peer.
+        info_hash: The 20-byte info hash of the torrent.
+        connect_timeout: Timeout in seconds for establishing each connection.
+                         Defaults to CONNECT_TIMEOUT.
+        handshake_timeout: Timeout in seconds for receiving the peer's handshake
+                           response. Defaults to HANDSHAKE_RESPONSE_TIMEOUT.
+        utp_fallback: Whether to retry over uTP. Defaults to UTP_FALLBACK.
+
+    Returns:
+        The (reader, writer) pair of the first successful handshake, or
+        (None, None) if neither transport succeeded.
+    """
+    handshake_result = await perform_handshake(
+        peer_ip, peer_port, info_hash, connect_timeout, handshake_timeout
+    )
+    if handshake_result and all(handshake_result):
+        return handshake_result
+    if utp_fallback:
+        print(f"TCP handshake with {peer_ip}:{peer_port} failed, retrying over uTP")
+        handshake_result = await perform_handshake(
+            peer_ip,
+            peer_port,
+            info_hash,
+            connect_timeout,
+            handshake_timeout,
+            use_utp=True,
+        )
+        if handshake_result and all(handshake_result):
+            return handshake_result
+    return None, None
+
+
 async def main():
     """
     Main function.
@@ -0,0 +1,399 @@
+# Standard imports
+import asyncio
+import hashlib
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+from typing import List, Optional, Sequence, Set, Tuple
+
+# Local imports
+from torrent_parser import parse_torrent, parse_piece_info
+from tracker_request import get_peers
+from peer_handshake import connect_to_peer
+from data_download import MAX_OUTSTANDING_REQUESTS, read_bitfield, request_full_piece
+
+# Define default sharding values as constants
+NUM_WORKERS = os.cpu_count() or 1
+MAX_PIECE_ATTEMPTS = 3
+MAX_PEER_CONNECTIONS_PER_WORKER = 8  # Handshakes run concurrently up to this many
+RESULT_TIMEOUT = 1  # Seconds between liveness checks of the worker processes
+WORKER_JOIN_TIMEOUT = 10
+OUTPUT_FILE = "sharded_output.bin"
+
+
+def _verify_piece(
+    piece_index: int,
+    data: Optional[bytes],
+    expected_length: int,
+    piece_hashes: Optional[Sequence[bytes]],
+) -> bool:
+    """
+    Checks downloaded piece data against its length and SHA1 hash, or only
+    against its length when no hashes are available.
+    """
+    if data is None or len(data) != expected_length:
+        return False
+    if piece_hashes is None:
+        return True
+    return hashlib.sha1(data).digest() == piece_hashes[piece_index]
+
+
+async def _connect_peers(
+    peers: Sequence[Tuple[str, int]],
+    info_hash: bytes,
+    num_pieces: int,
+    max_connections: int = MAX_PEER_CONNECTIONS_PER_WORKER,
+) -> List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, Set[int]]]:
+    """
+    Connects to up to 'max_connections' of the peers, running the handshakes
+    concurrently, and reads the bitfield of every connected peer.
+
+    Returns:
+        A list of (reader, writer, pieces the peer has) tuples.
+    """
+    connections: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, Set[int]]] = []
+    remaining = list(peers)
+    while remaining and len(connections) < max_connections:
+        batch_size = max_connections - len(connections)
+        batch, remaining = remaining[:batch_size], remaining[batch_size:]
+        handshake_results = await asyncio.gather(
+            *(connect_to_peer(peer_ip, peer_port, info_hash) for peer_ip, peer_port in batch)
+        )
+        opened = [result for result in handshake_results if result and all(result)]
+        bitfields = await asyncio.gather(
+            *(read_bitfield(reader, num_pieces) for reader, _ in opened)
+        )
+        connections.extend(
+            (reader, writer, have) for (reader, writer), have in zip(opened, bitfields)
+        )
+    return connections
+
+
+async def _worker_main(
+    worker_id: int,
+    peers: Sequence[Tuple[str, int]],
+    info_hash: bytes,
+    piece_length: int,
+    total_length: int,
+    output_path: str,
+    piece_hashes: Optional[Sequence[bytes]],
+    task_queue: multiprocessing.Queue,
+    result_queue: multiprocessing.Queue,
+) -> None:
+    """
+    Event loop of one worker process.
+
+    Connects to the worker's share of the peers, downloads the pieces the
+    coordinator puts on 'task_queue', verifies them, writes them straight into
+    the memory-mapped output file and reports each outcome on 'result_queue'
+    as a (worker_id, piece_index, success) tuple. Each connection only takes
+    the pieces its peer has. A piece that no live connection can take is
+    handed back: 'success' is False if it failed here, or None if it was never
+    attempted. A (worker_id, None, None) tuple tells the coordinator that the
+    worker has no connections left. A None task stops the worker.
+    """
+    num_pieces = -(-total_length // piece_length)
+    connections = await _connect_peers(peers, info_hash, num_pieces)
+    print(f"Worker {worker_id}: connected to {len(connections)}/{len(peers)} peers")
+
+    loop = asyncio.get_running_loop()
+    pending: Set[int] = set()
+    tried: Set[int] = set()  # Pieces that failed on a connection of this worker
+    failed_on = [set() for _ in connections]  # Pieces each connection failed
+    live_connections = set(range(len(connections)))
+    task_ready = asyncio.Condition()
+    stopping = False
+    if not connections:
+        result_queue.put((worker_id, None, None))
+
+    def can_take(connection_id: int, piece_index: int) -> bool:
+        return (
+            piece_index in connections[connection_id][2]
+            and piece_index not in failed_on[connection_id]
+        )
+
+    def release_unservable() -> None:
+        for piece_index in sorted(pending):
+            if not any(can_take(c, piece_index) for c in live_connections):
+                pending.discard(piece_index)
+                result_queue.put(
+                    (worker_id, piece_index, False if piece_index in tried else None)
+                )
+
+    with open(output_path, "r+b") as f, mmap.mmap(f.fileno(), total_length) as output:
+
+        async def feed() -> None:
+            nonlocal stopping
+            while True:
+                piece_index = await loop.run_in_executor(None, task_queue.get)
+                async with task_ready:
+                    if piece_index is None:
+                        stopping = True
+                    else:
+                        pending.add(piece_index)
+                        release_unservable()
+                    task_ready.notify_all()
+                if stopping:
+                    return
+
+        async def download(connection_id: int) -> None:
+            reader, writer, peer_have = connections[connection_id]
+            consecutive_failures = 0
+            try:
+                while consecutive_failures < MAX_PIECE_ATTEMPTS:
+                    async with task_ready:
+                        await task_ready.wait_for(
+                            lambda: stopping
+                            or any(can_take(connection_id, i) for i in pending)
+                        )
+                        if stopping:
+                            return
+                        piece_index = min(
+                            i for i in pending if can_take(connection_id, i)
+                        )
+                        pending.discard(piece_index)
+
+                    start = piece_index * piece_length
+                    expected_length = min(piece_length, total_length - start)
+                    data = await request_full_piece(
+                        reader,
+                        writer,
+                        piece_index,
+                        expected_length,
+                        max_outstanding=MAX_OUTSTANDING_REQUESTS,
+                        peer_have=peer_have,
+                    )
+                    if _verify_piece(piece_index, data, expected_length, piece_hashes):
+                        output[start : start + expected_length] = data
+                        consecutive_failures = 0
+                        result_queue.put((worker_id, piece_index, True))
+                        continue
+
+                    # Bad data is capped per piece; only a silent peer is dropped.
+                    consecutive_failures = consecutive_failures + 1 if data is None else 0
+                    failed_on[connection_id].add(piece_index)
+                    tried.add(piece_index)
+                    async with task_ready:
+                        pending.add(piece_index)
+                        release_unservable()
+                        task_ready.notify_all()
+            finally:
+                live_connections.discard(connection_id)
+                if not live_connections and not stopping:
+                    result_queue.put((worker_id, None, None))
+                async with task_ready:
+                    release_unservable()
+                    task_ready.notify_all()
+
+        try:
+            await asyncio.gather(
+                feed(), *(download(c) for c in range(len(connections)))
+            )
+            output.flush()
+        finally:
+            for _, writer, _ in connections:
+                try:
+                    writer.close()
+                    await writer.wait_closed()
+                except Exception as e:
+                    print(f"Worker {worker_id}: error closing writer: {e}")
+
+
+def _run_worker(*args) -> None:
+    """
+    Entry point of a worker process: runs '_worker_main' on its own event loop.
+    """
+    asyncio.run(_worker_main(*args))
+
+
+def download_sharded(
+    peer_list: Sequence[Tuple[str, int]],
+    info_hash: bytes,
+    piece_length: int,
+    total_length: int,
+    output_path: str,
+    piece_hashes: Optional[Sequence[bytes]] = None,
+    num_workers: int = NUM_WORKERS,
+) -> bytearray:
+    """
+    Downloads a torrent with several worker processes, each running its own
+    asyncio event loop.
+
+    Acts as the coordinator: it preallocates the output file, splits the peers
+    and contiguous ranges of pieces across the workers, and tracks which pieces
+    are done. The workers write verified pieces directly into the shared
+    memory-mapped output file. A piece a worker hands back, because it failed
+    there or because none of the worker's peers have it, is reassigned to the
+    next worker that is alive, still has peer connections and has not handed
+    it back before, up to MAX_PIECE_ATTEMPTS failed attempts. Pieces assigned
+    to a worker process that exits are reassigned too.
+
+    Args:
+        peer_list: A list of (ip, port) tuples as returned by 'get_peers'.
+        info_hash: The 20-byte info hash of the torrent.
+        piece_length: The 'piece length' of the torrent in bytes.
+        total_length: The total length of the torrent's data in bytes.
+        output_path: Path of the file the torrent's data is written to.
+        piece_hashes: Optional 20-byte SHA1 hashes used to verify each piece.
+        num_workers: Number of worker processes. Defaults to NUM_WORKERS (one
+                     per CPU core), capped by the number of peers and pieces.
+
+    Returns:
+        The bitfield of the download: one byte per piece, 1 if the piece was
+        downloaded and verified, otherwise 0.
+    """
+    num_pieces = -(-total_length // piece_length)
+    bitfield = bytearray(num_pieces)
+    if num_pieces == 0 or not peer_list:
+        print("Nothing to download: no pieces or no peers.")
+        return bitfield
+
+    with open(output_path, "wb") as f:
+        f.truncate(total_length)
+
+    num_workers = max(1, min(num_workers, len(peer_list), num_pieces))
+    result_queue: multiprocessing.Queue = multiprocessing.Queue()
+    task_queues: List[multiprocessing.Queue] = []
+    workers: List[multiprocessing.Process] = []
+
+    assigned: List[Set[int]] = []  # Pieces each worker has not reported yet
+    usable = [True] * num_workers  # Alive and still connected to a peer
+
+    for worker_id in range(num_workers):
+        task_queue: multiprocessing.Queue = multiprocessing.Queue()
+        first_piece = worker_id * num_pieces // num_workers
+        last_piece = (worker_id + 1) * num_pieces // num_workers
+        for piece_index in range(first_piece, last_piece):
+            task_queue.put(piece_index)
+        assigned.append(set(range(first_piece, last_piece)))
+
+        process = multiprocessing.Process(
+            target=_run_worker,
+            args=(
+                worker_id,
+                list(peer_list[worker_id::num_workers]),
+                info_hash,
+                piece_length,
+                total_length,
+                output_path,
+                piece_hashes,
+                task_queue,
+                result_queue,
+            ),
+            daemon=True,
+        )
+        process.start()
+        task_queues.append(task_queue)
+        workers.append(process)
+
+    attempts = [0] * num_pieces
+    declined: List[Set[int]] = [set() for _ in range(num_pieces)]  # Workers per piece
+    outstanding = num_pieces
+
+    def retry(piece_index: int, previous_worker: int) -> None:
+        nonlocal outstanding
+        declined[piece_index].add(previous_worker)
+        if attempts[piece_index] >= MAX_PIECE_ATTEMPTS:
+            print(f"Giving up on piece {piece_index} after {attempts[piece_index]} attempts")
+            outstanding -= 1
+            return
+        for offset in range(1, num_workers + 1):
+            worker_id = (previous_worker + offset) % num_workers
+            if (
+                usable[worker_id]
+                and worker_id not in declined[piece_index]
+                and workers[worker_id].is_alive()
+            ):
+                break
+        else:
+            print(f"Giving up on piece {piece_index}: no worker can download it")
+            outstanding -= 1
+            return
+        assigned[worker_id].add(piece_index)
+        task_queues[worker_id].put(piece_index)
+
+    try:
+        while outstanding:
+            try:
+                worker_id, piece_index, success = result_queue.get(
+                    timeout=RESULT_TIMEOUT
+                )
+            except queue.Empty:
+                worker_id = None
+
+            if worker_id is not None:
+                if piece_index is None:
+                    print(f"Worker {worker_id} has no peer connections left")
+                    usable[worker_id] = False
+                elif piece_index in assigned[worker_id]:
+                    assigned[worker_id].discard(piece_index)
+                    if success:
+                        bitfield[piece_index] = 1
+                        outstanding -= 1
+                    else:
+                        # Pieces handed back unattempted (None) keep their attempts.
+                        attempts[piece_index] += success is False
+                        retry(piece_index, worker_id)
+
+            for dead_worker, process in enumerate(workers):
+                if assigned[dead_worker] and not process.is_alive():
+                    print(
+                        f"Worker {dead_worker} exited with "
+                        f"{len(assigned[dead_worker])} pieces unfinished"
+                    )
+                    usable[dead_worker] = False
+                    unfinished, assigned[dead_worker] = assigned[dead_worker], set()
+                    for piece_index in sorted(unfinished):
+                        attempts[piece_index] += 1
+                        retry(piece_index, dead_worker)
+    finally:
+        for task_queue in task_queues:
+            task_queue.put(None)
+        for process in workers:
+            process.join(WORKER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+    print(f"Downloaded {sum(bitfield)}/{num_pieces} pieces with {num_workers} workers.")
+    return bitfield
+
+
+def main():
+    """
+    Main function to download a torrent across multiple worker processes.
+    """
+    torrent_file = (
+        "example.torrent"  # Replace with the path to your .torrent file
+    )
+    tracker_url, info_hash = parse_torrent(torrent_file)
+    if tracker_url is None or info_hash is None:
+        print("Error parsing torrent file. Cannot proceed with download.")
+        return
+
+    peer_list = get_peers(tracker_url, info_hash)
+    if not peer_list:
+        print("No peers found.")
+        return
+    random.shuffle(peer_list)
+
+    piece_length, piece_hashes, file_lengths = parse_piece_info(torrent_file)
+    if piece_length is None or piece_hashes is None or file_lengths is None:
+        print("Error reading the piece layout of the torrent. Cannot proceed with download.")
+        return
+
+    bitfield = download_sharded(
+        peer_list,
+        info_hash,
+        piece_length,
+        sum(file_lengths),
+        OUTPUT_FILE,
+        piece_hashes,
+    )
+    if all(bitfield):
+        print(f"Download complete: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
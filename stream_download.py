@@ -0,0 +1,394 @@
+# Standard imports
+import asyncio
+import hashlib
+import random
+import tempfile
+import time
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Sequence, Set, Tuple
+
+# Local imports
+from torrent_parser import parse_torrent, parse_piece_info
+from tracker_request import get_peers
+from peer_handshake import connect_to_peer
+from data_download import read_bitfield, request_full_piece
+
+# Define default streaming values as constants
+MAX_PEER_CONNECTIONS = 2  # Set to -1 to try all peers
+STREAM_WINDOW_PIECES = 4  # Pieces ahead of the read cursor fetched in order
+STREAM_CHUNK_SIZE = 16384
+MAX_PIECE_ATTEMPTS = 3
+STREAM_OUTPUT_FILE = "stream_output.bin"
+
+
+class PieceStreamer:
+    """
+    Streams a file out of an in-progress torrent download.
+
+    Whole pieces are downloaded block by block over one or more peer
+    connections, each of which is only asked for the pieces its peer has.
+    Pieces inside a sliding window ahead of the read cursor are fetched first
+    and in order; all other pieces of the torrent are fetched rarest-first
+    among the connected peers. Verified pieces are written to a backing file
+    rather than kept in memory. Reads wait only for the pieces they cover, so
+    playback can start as soon as the first few pieces have been verified.
+    """
+
+    def __init__(
+        self,
+        connections: Sequence[Tuple[asyncio.StreamReader, asyncio.StreamWriter]],
+        piece_length: int,
+        total_length: int,
+        file_offset: int = 0,
+        file_length: Optional[int] = None,
+        piece_hashes: Optional[Sequence[bytes]] = None,
+        peer_pieces: Optional[Sequence[Optional[Set[int]]]] = None,
+        window: int = STREAM_WINDOW_PIECES,
+        backing_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            connections: (reader, writer) pairs of peers that completed the handshake.
+            piece_length: The 'piece length' of the torrent in bytes.
+            total_length: The total length of the torrent's data in bytes.
+            file_offset: Byte offset of the streamed file within the torrent.
+                         Defaults to 0 (the first file).
+            file_length: Length of the streamed file in bytes. Defaults to the
+                         rest of the torrent after 'file_offset'.
+            piece_hashes: Optional 20-byte SHA1 hashes used to verify each piece.
+            peer_pieces: Optional set of piece indices each connection's peer
+                         has, as returned by 'read_bitfield', in the same order
+                         as 'connections'. The sets are updated with the 'have'
+                         messages received while downloading. None, for the
+                         whole argument or one of its entries, means the peer
+                         has every piece.
+            window: Number of pieces ahead of the read cursor to fetch in order.
+                    Defaults to STREAM_WINDOW_PIECES.
+            backing_path: Path of the file verified pieces are written to.
+                          Defaults to an anonymous temporary file.
+        """
+        self.connections = list(connections)
+        self.piece_length = piece_length
+        self.total_length = total_length
+        self.num_pieces = -(-total_length // piece_length)
+        self.file_offset = file_offset
+        self.file_length = (
+            file_length if file_length is not None else total_length - file_offset
+        )
+        self.piece_hashes = piece_hashes
+        self.peer_pieces: List[Optional[Set[int]]] = (
+            list(peer_pieces) if peer_pieces is not None else [None] * len(self.connections)
+        )
+        self.window = window
+        self.backing_path = backing_path
+
+        self.cursor = 0  # Byte offset of the next read within the file
+        self.have: Set[int] = set()
+        self.in_flight: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.attempts: Dict[Tuple[int, int], int] = {}  # (connection, piece) -> failures
+        self._live_connections: Set[int] = set()
+        self._piece_ready = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+        self._backing_file: Optional[BinaryIO] = None
+
+    def start(self) -> None:
+        """
+        Opens the backing file and starts one download worker per peer connection.
+        With no connections, every piece is marked as failed.
+        """
+        if self.backing_path is None:
+            self._backing_file = tempfile.TemporaryFile()
+        else:
+            self._backing_file = open(self.backing_path, "w+b")
+        self._backing_file.truncate(self.total_length)
+
+        self._live_connections = set(range(len(self.connections)))
+        for connection_id, (reader, writer) in enumerate(self.connections):
+            self._workers.append(
+                asyncio.create_task(self._worker(connection_id, reader, writer))
+            )
+        self._update_failed()
+
+    async def close(self) -> None:
+        """
+        Stops all download workers and closes the backing file.
+        """
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._backing_file is not None:
+            self._backing_file.close()
+
+    async def read(self, offset: int, size: int) -> Optional[bytes]:
+        """
+        Reads bytes from the streamed file, waiting for the pieces they cover.
+
+        Moving the read cursor to 'offset' makes the pieces just after it the
+        next ones to be requested.
+
+        Args:
+            offset: Byte offset within the file.
+            size: Maximum number of bytes to read.
+
+        Returns:
+            The requested bytes (shorter at the end of the file, empty past it),
+            or None if a covering piece could not be downloaded.
+
+        Raises:
+            RuntimeError: If 'start' has not been called.
+        """
+        if self._backing_file is None:
+            raise RuntimeError("PieceStreamer.start() must be called before reading")
+        if offset >= self.file_length:
+            return b""
+        size = min(size, self.file_length - offset)
+        self.cursor = offset
+
+        start = self.file_offset + offset
+        first_piece = start // self.piece_length
+        last_piece = (start + size - 1) // self.piece_length
+        needed = range(first_piece, last_piece + 1)
+
+        async with self._piece_ready:
+            await self._piece_ready.wait_for(
+                lambda: all(i in self.have or i in self.failed for i in needed)
+            )
+
+        if any(i in self.failed for i in needed):
+            print(f"Cannot read {size} bytes at offset {offset}: piece download failed")
+            return None
+
+        self._backing_file.seek(start)
+        return self._backing_file.read(size)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.iter_chunks()
+
+    async def iter_chunks(
+        self, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the streamed file in order, from the start, in chunks.
+
+        Args:
+            chunk_size: Size in bytes of each yielded chunk (the last one may be
+                        shorter). Defaults to STREAM_CHUNK_SIZE.
+
+        Raises:
+            IOError: If a piece of the file could not be downloaded.
+        """
+        offset = 0
+        while offset < self.file_length:
+            chunk = await self.read(offset, chunk_size)
+            if chunk is None:
+                raise IOError(f"Streaming stopped at offset {offset}: piece download failed")
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+
+    def _peer_has(self, connection_id: int, piece_index: int) -> bool:
+        pieces = self.peer_pieces[connection_id]
+        return pieces is None or piece_index in pieces
+
+    def _can_fetch(self, connection_id: int, piece_index: int) -> bool:
+        """
+        Whether the connection's peer has the piece and the connection has
+        attempts left for it.
+        """
+        return (
+            self._peer_has(connection_id, piece_index)
+            and self.attempts.get((connection_id, piece_index), 0) < MAX_PIECE_ATTEMPTS
+        )
+
+    def _availability(self, piece_index: int) -> int:
+        return sum(
+            1 for c in self._live_connections if self._peer_has(c, piece_index)
+        )
+
+    def _next_piece(self, connection_id: int) -> Optional[int]:
+        """
+        Picks the next piece to request over a connection among those its peer
+        has: the first missing piece in the window ahead of the read cursor,
+        otherwise the rarest missing piece among the live connections.
+        """
+        candidates = [
+            i
+            for i in range(self.num_pieces)
+            if i not in self.have
+            and i not in self.in_flight
+            and i not in self.failed
+            and self._can_fetch(connection_id, i)
+        ]
+        if not candidates:
+            return None
+
+        cursor_piece = (self.file_offset + self.cursor) // self.piece_length
+        in_window = [
+            i for i in candidates if cursor_piece <= i < cursor_piece + self.window
+        ]
+        if in_window:
+            return min(in_window)
+        return min(candidates, key=lambda i: (self._availability(i), random.random()))
+
+    def _update_failed(self) -> None:
+        """
+        Marks as failed the missing pieces that no live connection can fetch:
+        their peers lack them or have used up their attempts on them.
+        """
+        for i in range(self.num_pieces):
+            if i in self.have or i in self.failed or i in self.in_flight:
+                continue
+            if not any(self._can_fetch(c, i) for c in self._live_connections):
+                self.failed.add(i)
+
+    def _piece_size(self, piece_index: int) -> int:
+        return min(self.piece_length, self.total_length - piece_index * self.piece_length)
+
+    def _verify(self, piece_index: int, data: Optional[bytes]) -> bool:
+        if data is None or len(data) != self._piece_size(piece_index):
+            return False
+        if self.piece_hashes is None:
+            return True
+        return hashlib.sha1(data).digest() == self.piece_hashes[piece_index]
+
+    async def _worker(
+        self,
+        connection_id: int,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """
+        Downloads pieces over one connection until it has nothing left to fetch
+        or fails to deliver MAX_PIECE_ATTEMPTS pieces in a row. While the only pieces it
+        could fetch are in flight on other connections, it waits for them in
+        case they fail there.
+        """
+        consecutive_failures = 0
+        try:
+            while consecutive_failures < MAX_PIECE_ATTEMPTS:
+                piece_index = self._next_piece(connection_id)
+                if piece_index is None:
+                    if not any(self._can_fetch(connection_id, i) for i in self.in_flight):
+                        break
+                    async with self._piece_ready:
+                        await self._piece_ready.wait()
+                    continue
+
+                self.in_flight.add(piece_index)
+                try:
+                    data = await request_full_piece(
+                        reader,
+                        writer,
+                        piece_index,
+                        self._piece_size(piece_index),
+                        peer_have=self.peer_pieces[connection_id],
+                    )
+                finally:
+                    self.in_flight.discard(piece_index)
+
+                if self._verify(piece_index, data):
+                    self._backing_file.seek(piece_index * self.piece_length)
+                    self._backing_file.write(data)
+                    self.have.add(piece_index)
+                    consecutive_failures = 0
+                else:
+                    print(f"Piece {piece_index} failed download or verification")
+                    # Bad data is capped per piece; only a silent peer is dropped.
+                    consecutive_failures = consecutive_failures + 1 if data is None else 0
+                    key = (connection_id, piece_index)
+                    self.attempts[key] = self.attempts.get(key, 0) + 1
+
+                async with self._piece_ready:
+                    self._update_failed()
+                    self._piece_ready.notify_all()
+        finally:
+            # Release readers waiting on pieces only this connection could fetch.
+            self._live_connections.discard(connection_id)
+            async with self._piece_ready:
+                self._update_failed()
+                self._piece_ready.notify_all()
+
+
+async def main():
+    """
+    Main function to stream the first file of a torrent to disk while it downloads.
+    """
+    torrent_file = (
+        "example.torrent"  # Replace with the path to your .torrent file
+    )
+    tracker_url, info_hash = parse_torrent(torrent_file)
+    if tracker_url is None or info_hash is None:
+        print("Error parsing torrent file. Cannot proceed with streaming.")
+        return
+
+    peer_list = get_peers(tracker_url, info_hash)
+    if not peer_list:
+        print("No peers found.")
+        return
+    random.shuffle(peer_list)
+
+    piece_length, piece_hashes, file_lengths = parse_piece_info(torrent_file)
+    if piece_length is None or piece_hashes is None or file_lengths is None:
+        print("Error reading the piece layout of the torrent. Cannot proceed with streaming.")
+        return
+    total_length = sum(file_lengths)
+    num_pieces = len(piece_hashes)
+
+    peers_to_try = (
+        len(peer_list)
+        if MAX_PEER_CONNECTIONS == -1
+        else min(MAX_PEER_CONNECTIONS, len(peer_list))
+    )
+    connections: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+    peer_pieces: List[Optional[Set[int]]] = []
+    for peer_ip, peer_port in peer_list[:peers_to_try]:
+        handshake_result = await connect_to_peer(peer_ip, peer_port, info_hash)
+        if handshake_result and all(handshake_result):
+            connections.append(handshake_result)
+            peer_pieces.append(await read_bitfield(handshake_result[0], num_pieces))
+
+    if not connections:
+        print("Handshake failed with all attempted peers.")
+        return
+
+    # Stream the first file of the torrent.
+    streamer = PieceStreamer(
+        connections,
+        piece_length,
+        total_length,
+        file_length=file_lengths[0],
+        piece_hashes=piece_hashes,
+        peer_pieces=peer_pieces,
+    )
+    streamer.start()
+    started = time.monotonic()
+    first_byte_at: Optional[float] = None
+    streamed = 0
+
+    try:
+        with open(STREAM_OUTPUT_FILE, "wb") as f:
+            async for chunk in streamer:
+                if first_byte_at is None:
+                    first_byte_at = time.monotonic() - started
+                    print(f"First bytes available after {first_byte_at:.2f} seconds")
+                f.write(chunk)
+                streamed += len(chunk)
+    except IOError as e:
+        print(f"Streaming failed after {streamed} bytes: {e}")
+        return
+    finally:
+        await streamer.close()
+        for _, writer in connections:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception as e:
+                print(f"Error closing writer: {e}")
+
+    print(f"Streamed {streamed} bytes to {STREAM_OUTPUT_FILE}.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
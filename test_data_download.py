@@ -0,0 +1,83 @@
+# Standard imports
+import asyncio
+import random
+import unittest
+
+# Local imports
+from data_download import BLOCK_SIZE, read_bitfield, request_full_piece
+
+# Define default test values as constants
+PIECE_LENGTH = 3 * BLOCK_SIZE + 100
+TRANSFER_TIMEOUT = 10
+
+
+def _message(message_id: int, payload: bytes = b"") -> bytes:
+    return (len(payload) + 1).to_bytes(4, byteorder="big") + bytes([message_id]) + payload
+
+
+class NoisyPeer:
+    """
+    A loopback peer that announces pieces 1 and 3, then answers block requests
+    for piece 1 with keep-alives, 'have', 'choke' and stale 'piece' messages
+    interleaved between the real blocks.
+    """
+
+    def __init__(self, piece: bytes):
+        self.piece = piece
+
+    async def handle(self, reader, writer):
+        writer.write(_message(4, (3).to_bytes(4, byteorder="big")))
+        writer.write(_message(5, bytes([0b01000000])))
+        try:
+            while True:
+                length = int.from_bytes(await reader.readexactly(4), byteorder="big")
+                message = await reader.readexactly(length)
+                index = int.from_bytes(message[1:5], byteorder="big")
+                begin = int.from_bytes(message[5:9], byteorder="big")
+                block_length = int.from_bytes(message[9:13], byteorder="big")
+                block = self.piece[begin : begin + block_length]
+
+                writer.write(bytes(4))  # Keep-alive
+                writer.write(_message(4, (7).to_bytes(4, byteorder="big")))
+                writer.write(_message(0))  # Choke
+                stale_index = (index + 1).to_bytes(4, byteorder="big")
+                writer.write(_message(7, stale_index + message[5:9] + bytes(len(block))))
+                writer.write(_message(7, message[1:9] + block))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+
+class RequestFullPieceTest(unittest.IsolatedAsyncioTestCase):
+    async def test_skips_messages_between_blocks(self):
+        piece = random.Random(3).randbytes(PIECE_LENGTH)
+        server = await asyncio.start_server(NoisyPeer(piece).handle, "127.0.0.1", 0)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        port = server.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        self.addCleanup(writer.close)
+
+        peer_have = await read_bitfield(reader, 8)
+        self.assertEqual(peer_have, {1, 3})
+
+        for max_outstanding in (1, 4):
+            with self.subTest(max_outstanding=max_outstanding):
+                data = await asyncio.wait_for(
+                    request_full_piece(
+                        reader,
+                        writer,
+                        1,
+                        PIECE_LENGTH,
+                        max_outstanding=max_outstanding,
+                        peer_have=peer_have,
+                    ),
+                    TRANSFER_TIMEOUT,
+                )
+                self.assertEqual(data, piece)
+        self.assertEqual(peer_have, {1, 3, 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
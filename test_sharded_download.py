@@ -0,0 +1,116 @@
+# Standard imports
+import hashlib
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+# Local imports
+import data_download
+import sharded_download
+from benchmark_sharded_download import (
+    PEER_CORRUPT,
+    PEER_HANGUP,
+    FakePeers,
+    connect_to_fake_peer,
+)
+from sharded_download import download_sharded
+
+# Define default test values as constants
+PIECE_LENGTH = 2 * data_download.BLOCK_SIZE
+NUM_PIECES = 24
+
+
+def setUpModule():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise unittest.SkipTest("the workers inherit the patched connect through fork")
+    multiprocessing.set_start_method("fork", force=True)
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class DownloadShardedTest(unittest.TestCase):
+    def setUp(self):
+        self.content = random.Random(2).randbytes(PIECE_LENGTH * NUM_PIECES - 500)
+        self.piece_hashes = [
+            hashlib.sha1(self.content[i : i + PIECE_LENGTH]).digest()
+            for i in range(0, len(self.content), PIECE_LENGTH)
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.output_path = os.path.join(directory.name, "output.bin")
+
+        patcher = mock.patch.object(sharded_download, "connect_to_peer", connect_to_fake_peer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self, peer_list, num_workers):
+        return download_sharded(
+            peer_list,
+            bytes(20),
+            PIECE_LENGTH,
+            len(self.content),
+            self.output_path,
+            self.piece_hashes,
+            num_workers,
+        )
+
+    def _assert_complete(self, bitfield):
+        self.assertEqual(list(bitfield), [1] * NUM_PIECES)
+        with open(self.output_path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_dead_hung_up_and_corrupt_peers(self):
+        with FakePeers(
+            self.content,
+            PIECE_LENGTH,
+            [None] * 4,
+            modes=["ok", PEER_CORRUPT, "ok", PEER_HANGUP],
+        ) as peers:
+            dead_peer = ("127.0.0.1", _closed_port())
+            # Worker 0 gets both good peers, worker 1 the corrupt and the
+            # hung-up one, and worker 2 only the dead one.
+            peer_list = [peers[0], peers[1], dead_peer, peers[2], peers[3]]
+            self._assert_complete(self._download(peer_list, 3))
+
+    def test_pieces_are_taken_only_from_peers_that_have_them(self):
+        even = {i for i in range(NUM_PIECES) if i % 2 == 0}
+        odd = set(range(NUM_PIECES)) - even
+        with FakePeers(self.content, PIECE_LENGTH, [even, odd]) as peer_list:
+            self._assert_complete(self._download(peer_list, 2))
+
+    def test_pieces_no_peer_has_are_given_up(self):
+        missing = {5, 17}
+        available = set(range(NUM_PIECES)) - missing
+        with FakePeers(self.content, PIECE_LENGTH, [available, available]) as peer_list:
+            bitfield = self._download(peer_list, 2)
+        self.assertEqual(
+            [i for i in range(NUM_PIECES) if not bitfield[i]], sorted(missing)
+        )
+
+    def test_pieces_of_a_crashed_worker_are_reassigned(self):
+        marker = os.path.join(self.directory, "crashed")
+
+        async def crash_once(*args, **kwargs):
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                return await data_download.request_full_piece(*args, **kwargs)
+            os._exit(1)
+
+        with mock.patch.object(sharded_download, "request_full_piece", crash_once):
+            with FakePeers(self.content, PIECE_LENGTH, [None] * 3) as peer_list:
+                self._assert_complete(self._download(peer_list, 3))
+        self.assertTrue(os.path.exists(marker))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# Standard imports
+import asyncio
+import hashlib
+import random
+import unittest
+from unittest import mock
+
+# Local imports
+import stream_download
+from stream_download import PieceStreamer
+
+# Define default test values as constants
+PIECE_LENGTH = 65536
+NUM_PIECES = 8
+READ_TIMEOUT = 10
+
+
+class FakePeers:
+    """
+    Stands in for 'request_full_piece': serves pieces of 'content' to fake
+    connections, optionally corrupting some of them, and records the requests.
+    """
+
+    def __init__(self, content: bytes, corrupt=()):
+        self.content = content
+        self.corrupt = set(corrupt)
+        self.requests = []
+
+    async def request_full_piece(
+        self, reader, writer, piece_index, piece_length, peer_have=None
+    ):
+        self.requests.append((reader, piece_index))
+        await asyncio.sleep(0)
+        start = piece_index * PIECE_LENGTH
+        data = self.content[start : start + piece_length]
+        if piece_index in self.corrupt:
+            return bytes(len(data))
+        return data
+
+
+class PieceStreamerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.content = random.Random(1).randbytes(PIECE_LENGTH * NUM_PIECES - 1000)
+        self.piece_hashes = [
+            hashlib.sha1(self.content[i : i + PIECE_LENGTH]).digest()
+            for i in range(0, len(self.content), PIECE_LENGTH)
+        ]
+
+    def _streamer(self, connections, **kwargs) -> PieceStreamer:
+        streamer = PieceStreamer(
+            connections,
+            PIECE_LENGTH,
+            len(self.content),
+            piece_hashes=self.piece_hashes,
+            **kwargs,
+        )
+        self.addAsyncCleanup(streamer.close)
+        return streamer
+
+    def _patch_peers(self, peers: FakePeers) -> None:
+        patcher = mock.patch.object(
+            stream_download, "request_full_piece", peers.request_full_piece
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_window_pieces_are_picked_in_order(self):
+        streamer = self._streamer([("peer", None)], window=3)
+        streamer.cursor = 2 * PIECE_LENGTH + 10
+        streamer.have.add(3)
+
+        self.assertEqual(streamer._next_piece(0), 2)
+        streamer.in_flight.add(2)
+        self.assertEqual(streamer._next_piece(0), 4)
+
+    def test_rarest_piece_is_picked_outside_the_window(self):
+        streamer = self._streamer(
+            [("a", None), ("b", None), ("c", None)],
+            peer_pieces=[set(range(NUM_PIECES)), {0, 1, 2, 3, 4, 5}, {0, 1, 2, 3, 6}],
+            window=2,
+        )
+        streamer._live_connections = {0, 1, 2}
+        streamer.have.update({0, 1})
+
+        # Pieces 2 and 3 have three sources, 4 to 6 have two, 7 has one.
+        self.assertEqual(streamer._next_piece(0), 7)
+        self.assertIn(streamer._next_piece(1), {4, 5})
+        self.assertEqual(streamer._next_piece(2), 6)
+
+    async def test_read_across_piece_boundaries_with_file_offset(self):
+        self._patch_peers(FakePeers(self.content))
+        file_offset = PIECE_LENGTH + 123
+        streamer = self._streamer(
+            [("a", None), ("b", None)], file_offset=file_offset, file_length=3 * PIECE_LENGTH
+        )
+        streamer.start()
+
+        offset = PIECE_LENGTH - 50
+        data = await asyncio.wait_for(streamer.read(offset, 200), READ_TIMEOUT)
+        start = file_offset + offset
+        self.assertEqual(data, self.content[start : start + 200])
+
+        chunks = [
+            chunk async for chunk in streamer.iter_chunks(chunk_size=10000)
+        ]
+        self.assertEqual(
+            b"".join(chunks), self.content[file_offset : file_offset + 3 * PIECE_LENGTH]
+        )
+
+    async def test_iteration_raises_when_a_piece_cannot_be_downloaded(self):
+        self._patch_peers(FakePeers(self.content, corrupt={3}))
+        streamer = self._streamer([("a", None), ("b", None)])
+        streamer.start()
+
+        with self.assertRaises(IOError) as error:
+            async for _ in streamer.iter_chunks(chunk_size=PIECE_LENGTH):
+                pass
+        self.assertIn(f"offset {3 * PIECE_LENGTH}", str(error.exception))
+        self.assertEqual(streamer.failed, {3})
+
+    async def test_pieces_are_only_requested_from_peers_that_have_them(self):
+        peers = FakePeers(self.content)
+        self._patch_peers(peers)
+        even = {i for i in range(NUM_PIECES) if i % 2 == 0}
+        streamer = self._streamer(
+            [("even", None), ("full", None)], peer_pieces=[even, None]
+        )
+        streamer.start()
+
+        chunks = [chunk async for chunk in streamer]
+        self.assertEqual(b"".join(chunks), self.content)
+        self.assertEqual(streamer.failed, set())
+        self.assertTrue(
+            all(piece % 2 == 0 for reader, piece in peers.requests if reader == "even")
+        )
+
+    async def test_reads_fail_without_connections(self):
+        streamer = self._streamer([])
+        with self.assertRaises(RuntimeError):
+            await streamer.read(0, 100)
+
+        streamer.start()
+        data = await asyncio.wait_for(streamer.read(0, 100), READ_TIMEOUT)
+        self.assertIsNone(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+# Standard imports
+import asyncio
+import hashlib
+import random
+import time
+import unittest
+from unittest import mock
+
+# Local imports
+import peer_handshake
+from utp_transport import (
+    CCONTROL_TARGET_US,
+    ST_DATA,
+    UTPConnection,
+    UTPEndpoint,
+    decode_packet,
+    open_utp_connection,
+    start_utp_server,
+)
+
+# Define default test values as constants
+TRANSFER_TIMEOUT = 60
+PAYLOAD_SIZE = 65536
+
+
+class DropFirstDataEndpoint(UTPEndpoint):
+    """
+    A UTPEndpoint that drops the first DATA packet it sends.
+    """
+
+    dropped = False
+
+    def send_datagram(self, data, addr):
+        packet = decode_packet(data)
+        if not self.dropped and packet is not None and packet.type == ST_DATA:
+            self.dropped = True
+            return
+        super().send_datagram(data, addr)
+
+
+class UTPLoopbackTest(unittest.IsolatedAsyncioTestCase):
+    async def _close_endpoint(self, endpoint: UTPEndpoint) -> None:
+        endpoint.close()
+
+    async def _echo_transfer(self, seed: int) -> None:
+        """
+        Sends a payload through an echo server over a lossy, delayed loopback
+        link and checks that both directions deliver it byte for byte.
+        """
+
+        async def echo(reader, writer):
+            received = await reader.readexactly(PAYLOAD_SIZE)
+            writer.write(received)
+            writer.write(hashlib.sha1(received).digest())
+            await writer.drain()
+            writer.close()
+
+        server = await start_utp_server(
+            echo, "127.0.0.1", 0, loss_rate=0.05, delay=0.02, seed=seed
+        )
+        self.addAsyncCleanup(self._close_endpoint, server)
+        port = server.transport.get_extra_info("sockname")[1]
+        payload = random.Random(seed).randbytes(PAYLOAD_SIZE)
+
+        reader, writer = await open_utp_connection(
+            "127.0.0.1", port, loss_rate=0.05, delay=0.02, seed=seed + 1
+        )
+        writer.write(payload)
+        await writer.drain()
+        echoed = await asyncio.wait_for(
+            reader.readexactly(PAYLOAD_SIZE + 20), TRANSFER_TIMEOUT
+        )
+        self.assertEqual(echoed[:PAYLOAD_SIZE], payload)
+        self.assertEqual(echoed[PAYLOAD_SIZE:], hashlib.sha1(payload).digest())
+        self.assertEqual(await asyncio.wait_for(reader.read(), TRANSFER_TIMEOUT), b"")
+        writer.close()
+        await asyncio.wait_for(writer.wait_closed(), TRANSFER_TIMEOUT)
+
+    async def test_lossy_transfer_both_directions(self):
+        for seed in (7, 40):
+            with self.subTest(seed=seed):
+                await self._echo_transfer(seed)
+
+    async def test_last_data_packet_lost_before_fin(self):
+        digest = hashlib.sha1(b"payload").digest()
+
+        async def send_and_close(reader, writer):
+            # Queues the DATA packet and the FIN in the same flush.
+            writer.write(digest)
+            writer.close()
+
+        loop = asyncio.get_running_loop()
+        _, server = await loop.create_datagram_endpoint(
+            lambda: DropFirstDataEndpoint(
+                lambda: asyncio.StreamReaderProtocol(
+                    asyncio.StreamReader(), send_and_close
+                )
+            ),
+            local_addr=("127.0.0.1", 0),
+        )
+        self.addAsyncCleanup(self._close_endpoint, server)
+        port = server.transport.get_extra_info("sockname")[1]
+
+        reader, writer = await open_utp_connection("127.0.0.1", port)
+        received = await asyncio.wait_for(reader.read(), TRANSFER_TIMEOUT)
+        self.assertTrue(server.dropped)
+        self.assertEqual(received, digest)
+        writer.close()
+        await asyncio.wait_for(writer.wait_closed(), TRANSFER_TIMEOUT)
+
+
+class LEDBATTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        _, self.endpoint = await asyncio.get_running_loop().create_datagram_endpoint(
+            UTPEndpoint, local_addr=("127.0.0.1", 0)
+        )
+        self.connection = UTPConnection(
+            self.endpoint, ("127.0.0.1", 9), 5, 6, 1, asyncio.Protocol()
+        )
+
+    async def asyncTearDown(self):
+        self.endpoint.close()
+
+    async def test_window_grows_below_target_and_shrinks_above_it(self):
+        base_delay = 4294000000  # Close to the 32-bit timestamp wrap
+        now = time.monotonic()
+        initial_window = self.connection.max_window
+
+        for _ in range(10):
+            self.connection._apply_ledbat(base_delay, 1200, now)
+        grown_window = self.connection.max_window
+        self.assertGreater(grown_window, initial_window)
+
+        queued_delay = (base_delay + CCONTROL_TARGET_US + 50000) & 0xFFFFFFFF
+        self.connection._apply_ledbat(queued_delay, 1200, now)
+        self.assertLess(self.connection.max_window, grown_window)
+
+
+class UTPFallbackTest(unittest.IsolatedAsyncioTestCase):
+    async def test_retries_over_utp_when_tcp_handshake_fails(self):
+        connection = (mock.Mock(), mock.Mock())
+        transports = []
+
+        async def fake_handshake(*args, use_utp=False):
+            transports.append(use_utp)
+            return connection if use_utp else (None, None)
+
+        with mock.patch.object(peer_handshake, "perform_handshake", fake_handshake):
+            result = await peer_handshake.connect_to_peer("127.0.0.1", 6881, bytes(20))
+            self.assertEqual(result, connection)
+            self.assertEqual(transports, [False, True])
+
+            transports.clear()
+            result = await peer_handshake.connect_to_peer(
+                "127.0.0.1", 6881, bytes(20), utp_fallback=False
+            )
+            self.assertEqual(result, (None, None))
+            self.assertEqual(transports, [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 # Standard imports
 import hashlib
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 # Third-party imports
 import bencodepy
@@ -76,6 +76,49 @@ def parse_torrent(file_path: str) -> Tuple[Optional[str], Optional[bytes]]:
     return tracker_url, info_hash
 
 
+def parse_piece_info(
+    file_path: str,
+) -> Tuple[Optional[int], Optional[List[bytes]], Optional[List[int]]]:
+    """
+    Parses a .torrent file to extract the piece layout of its data.
+
+    Args:
+        file_path: The path to the .torrent file.
+
+    Returns:
+        A tuple containing the piece length (int), the 20-byte SHA1 hash of
+        each piece (list of bytes) and the length of each file in the torrent,
+        in order (list of int; a single-file torrent has one entry).
+        Returns (None, None, None) if the file cannot be read or decoded, or if
+        essential keys are missing.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            info_dict = bencodepy.decode(f.read())[b"info"]
+
+        piece_length = info_dict[b"piece length"]
+        pieces = info_dict[b"pieces"]
+        piece_hashes = [pieces[i : i + 20] for i in range(0, len(pieces), 20)]
+        if b"files" in info_dict:
+            file_lengths = [file[b"length"] for file in info_dict[b"files"]]
+        else:
+            file_lengths = [info_dict[b"length"]]
+        return piece_length, piece_hashes, file_lengths
+
+    except FileNotFoundError:
+        print(f"Error: Torrent file not found at {file_path}")
+    except bencodepy.DecodingError:
+        print(
+            f"Error: Could not decode torrent file at {file_path}. Invalid bencode format."
+        )
+    except KeyError as e:
+        print(f"Error: Missing key in torrent file: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+    return None, None, None
+
+
 if __name__ == "__main__":
     torrent_file = "example.torrent"  # Replace with the path to your .torrent file
 
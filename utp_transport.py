@@ -0,0 +1,846 @@
+# Standard imports
+import asyncio
+import hashlib
+import os
+import random
+import socket
+import struct
+import time
+from collections import deque
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+# uTP packet types and header layout (BEP 29)
+ST_DATA = 0
+ST_FIN = 1
+ST_STATE = 2
+ST_RESET = 3
+ST_SYN = 4
+UTP_VERSION = 1
+EXT_SELECTIVE_ACK = 1
+HEADER = struct.Struct(">BBHIIIHH")  # type/ver, extension, connection_id,
+# timestamp_microseconds, timestamp_difference_microseconds, wnd_size, seq_nr, ack_nr
+SEQ_MASK = 0xFFFF
+TIMESTAMP_MASK = 0xFFFFFFFF
+
+# Define default uTP values as constants
+UTP_MAX_PAYLOAD = 1200  # Keeps datagrams below common path MTUs
+UTP_RECV_WINDOW = 1048576
+UTP_WRITE_BUFFER_HIGH = 262144
+UTP_WRITE_BUFFER_LOW = 65536
+UTP_REORDER_LIMIT = 1024  # Packets ahead of ack_nr we are willing to buffer
+MAX_SELECTIVE_ACK_BYTES = 32
+CCONTROL_TARGET_US = 100000  # LEDBAT target queuing delay (100 ms)
+MAX_CWND_INCREASE_BYTES_PER_RTT = 3000
+MIN_WINDOW = UTP_MAX_PAYLOAD
+INITIAL_WINDOW = 4 * UTP_MAX_PAYLOAD
+BASE_DELAY_INTERVAL = 60  # Seconds covered by each base delay history entry
+BASE_DELAY_HISTORY = 2  # Entries kept, so the base delay spans two minutes
+INITIAL_TIMEOUT = 1.0
+MIN_TIMEOUT = 0.5
+MAX_RETRANSMISSIONS = 6
+DUPLICATE_ACKS_BEFORE_RESEND = 3
+CONNECT_TIMEOUT = 15
+FIN_TIMEOUT = 5
+TICK_INTERVAL = 0.05
+
+
+class UTPPacket(NamedTuple):
+    """
+    A decoded uTP packet.
+    """
+
+    type: int
+    connection_id: int
+    timestamp: int
+    timestamp_difference: int
+    wnd_size: int
+    seq_nr: int
+    ack_nr: int
+    selective_ack: Optional[bytes] = None
+    payload: bytes = b""
+
+
+def encode_packet(packet: UTPPacket) -> bytes:
+    """
+    Encodes a uTP packet, adding the selective ACK extension if present.
+    """
+    extension = EXT_SELECTIVE_ACK if packet.selective_ack else 0
+    header = HEADER.pack(
+        (packet.type << 4) | UTP_VERSION,
+        extension,
+        packet.connection_id,
+        packet.timestamp,
+        packet.timestamp_difference,
+        packet.wnd_size,
+        packet.seq_nr,
+        packet.ack_nr,
+    )
+    if packet.selective_ack:
+        header += bytes([0, len(packet.selective_ack)]) + packet.selective_ack
+    return header + packet.payload
+
+
+def decode_packet(data: bytes) -> Optional[UTPPacket]:
+    """
+    Decodes a uTP packet.
+
+    Returns:
+        The decoded packet, or None if the datagram is not a valid uTP packet.
+    """
+    if len(data) < HEADER.size:
+        return None
+    (
+        type_version,
+        extension,
+        connection_id,
+        timestamp,
+        timestamp_difference,
+        wnd_size,
+        seq_nr,
+        ack_nr,
+    ) = HEADER.unpack_from(data)
+    packet_type = type_version >> 4
+    if type_version & 0x0F != UTP_VERSION or packet_type > ST_SYN:
+        return None
+
+    selective_ack = None
+    position = HEADER.size
+    while extension:
+        if position + 2 > len(data):
+            return None
+        next_extension, length = data[position], data[position + 1]
+        if position + 2 + length > len(data):
+            return None
+        if extension == EXT_SELECTIVE_ACK:
+            selective_ack = data[position + 2 : position + 2 + length]
+        extension = next_extension
+        position += 2 + length
+
+    return UTPPacket(
+        packet_type,
+        connection_id,
+        timestamp,
+        timestamp_difference,
+        wnd_size,
+        seq_nr,
+        ack_nr,
+        selective_ack,
+        data[position:],
+    )
+
+
+def _seq_diff(a: int, b: int) -> int:
+    """Signed distance from sequence number b to a, modulo 2^16."""
+    return ((a - b + 0x8000) & SEQ_MASK) - 0x8000
+
+
+def _timestamp_diff(a: int, b: int) -> int:
+    """Signed distance from timestamp b to a, modulo 2^32."""
+    return ((a - b + 0x80000000) & TIMESTAMP_MASK) - 0x80000000
+
+
+def _timestamp_us() -> int:
+    return int(time.monotonic() * 1000000) & TIMESTAMP_MASK
+
+
+class _OutgoingPacket:
+    __slots__ = ("seq_nr", "type", "payload", "sent_at", "transmissions", "need_resend", "fast_resent")
+
+    def __init__(self, seq_nr: int, packet_type: int, payload: bytes):
+        self.seq_nr = seq_nr
+        self.type = packet_type
+        self.payload = payload
+        self.sent_at = 0.0
+        self.transmissions = 0
+        self.need_resend = False
+        self.fast_resent = False
+
+
+class UTPConnection(asyncio.Transport):
+    """
+    One uTP connection, exposed as an asyncio transport.
+
+    Wrapping it with asyncio.StreamReaderProtocol gives the usual
+    asyncio.StreamReader / asyncio.StreamWriter pair, so the handshake and
+    wire-protocol code works unchanged on top of uTP. Sending is limited by a
+    LEDBAT delay-based congestion window; lost packets are detected by
+    timeouts, duplicate ACKs and selective ACKs.
+    """
+
+    def __init__(
+        self,
+        endpoint: "UTPEndpoint",
+        addr: Tuple[str, int],
+        recv_id: int,
+        send_id: int,
+        seq_nr: int,
+        protocol: asyncio.BaseProtocol,
+    ):
+        super().__init__(
+            extra={"peername": addr, "sockname": endpoint.transport.get_extra_info("sockname")}
+        )
+        self._loop = asyncio.get_running_loop()
+        self._endpoint = endpoint
+        self._protocol = protocol
+        self.addr = addr
+        self.recv_id = recv_id
+        self.send_id = send_id
+        self.seq_nr = seq_nr
+        self.ack_nr = 0
+        self.state = "syn_sent"
+        self._connected = self._loop.create_future()
+
+        # Sending and congestion control
+        self._send_buffer = bytearray()
+        self._in_flight: Dict[int, _OutgoingPacket] = {}
+        self.cur_window = 0  # Payload bytes sent and not yet acked
+        self.max_window = float(INITIAL_WINDOW)
+        self.peer_window = UTP_RECV_WINDOW
+        self.rtt: Optional[float] = None
+        self.rtt_var = 0.0
+        self.timeout = INITIAL_TIMEOUT
+        self._timeout_at: Optional[float] = None
+        self._base_delays: deque = deque()
+        self._last_ack_nr: Optional[int] = None
+        self._duplicate_acks = 0
+        self._writing_paused = False
+
+        # Receiving
+        self._reply_micro = 0
+        self._recv_buffer: Dict[int, bytes] = {}
+        self._eof_seq: Optional[int] = None
+        self._eof_received = False
+        self._reading_paused = False
+
+        # Closing
+        self._closing = False
+        self._fin_seq: Optional[int] = None
+        self._close_deadline: Optional[float] = None
+        self._linger_deadline: Optional[float] = None
+
+    # --- asyncio.Transport interface ---
+
+    def write(self, data: bytes) -> None:
+        if self._closing or self.state == "closed":
+            return
+        self._send_buffer += data
+        if not self._writing_paused and len(self._send_buffer) > UTP_WRITE_BUFFER_HIGH:
+            self._writing_paused = True
+            self._protocol.pause_writing()
+        self._flush()
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def get_write_buffer_size(self) -> int:
+        return len(self._send_buffer) + self.cur_window
+
+    def is_closing(self) -> bool:
+        return self._closing or self.state == "closed"
+
+    def close(self) -> None:
+        """Sends FIN once all buffered data has been sent, then closes."""
+        if self.is_closing():
+            return
+        self._closing = True
+        if self.state != "connected":
+            self._finish(None)
+        else:
+            self._flush()
+
+    def abort(self) -> None:
+        if self.state == "closed":
+            return
+        if self.state == "connected":
+            self._send_packet(ST_RESET, self.seq_nr)
+        self._finish(None, linger=False)
+
+    def set_protocol(self, protocol: asyncio.BaseProtocol) -> None:
+        self._protocol = protocol
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        return self._protocol
+
+    def pause_reading(self) -> None:
+        self._reading_paused = True
+
+    def resume_reading(self) -> None:
+        if self._reading_paused:
+            self._reading_paused = False
+            if self.state == "connected":
+                self._send_state()  # Reopen the window advertised to the peer
+
+    def is_reading(self) -> bool:
+        return not self._reading_paused
+
+    async def wait_connected(self) -> None:
+        """Waits until the SYN has been acknowledged by the peer."""
+        await asyncio.shield(self._connected)
+
+    # --- Sending ---
+
+    def _advertised_window(self) -> int:
+        if self._reading_paused:
+            return 0
+        buffered = sum(len(payload) for payload in self._recv_buffer.values())
+        return max(0, UTP_RECV_WINDOW - buffered)
+
+    def _send_packet(
+        self,
+        packet_type: int,
+        seq_nr: int,
+        payload: bytes = b"",
+        selective_ack: Optional[bytes] = None,
+    ) -> None:
+        packet = UTPPacket(
+            packet_type,
+            self.recv_id if packet_type == ST_SYN else self.send_id,
+            _timestamp_us(),
+            self._reply_micro,
+            self._advertised_window(),
+            seq_nr,
+            self.ack_nr,
+            selective_ack,
+            payload,
+        )
+        self._endpoint.send_datagram(encode_packet(packet), self.addr)
+
+    def _send_state(self) -> None:
+        self._send_packet(ST_STATE, self.seq_nr, selective_ack=self._selective_ack())
+
+    def _transmit(self, packet: _OutgoingPacket) -> None:
+        if self._timeout_at is None:
+            self._timeout_at = time.monotonic() + self.timeout
+        packet.sent_at = time.monotonic()
+        packet.transmissions += 1
+        self._send_packet(packet.type, packet.seq_nr, packet.payload)
+
+    def _queue_packet(self, packet_type: int, payload: bytes = b"") -> None:
+        packet = _OutgoingPacket(self.seq_nr, packet_type, payload)
+        self._in_flight[packet.seq_nr] = packet
+        self.seq_nr = (self.seq_nr + 1) & SEQ_MASK
+        self.cur_window += len(payload)
+        self._transmit(packet)
+
+    def _window_allows(self, size: int) -> bool:
+        # Always allow one packet in flight so a zero window gets probed.
+        window = min(self.max_window, self.peer_window)
+        return self.cur_window == 0 or self.cur_window + size <= window
+
+    def _flush(self) -> None:
+        """Resends packets marked lost, then sends new data as the window allows."""
+        for packet in self._in_flight.values():
+            if not packet.need_resend:
+                continue
+            if not self._window_allows(len(packet.payload)):
+                return
+            packet.need_resend = False
+            self.cur_window += len(packet.payload)
+            self._transmit(packet)
+
+        if self.state != "connected":
+            return
+
+        while self._send_buffer:
+            size = min(len(self._send_buffer), UTP_MAX_PAYLOAD)
+            if not self._window_allows(size):
+                break
+            payload = bytes(self._send_buffer[:size])
+            del self._send_buffer[:size]
+            self._queue_packet(ST_DATA, payload)
+
+        if self._writing_paused and len(self._send_buffer) <= UTP_WRITE_BUFFER_LOW:
+            self._writing_paused = False
+            self._protocol.resume_writing()
+
+        if self._closing and not self._send_buffer and self._fin_seq is None:
+            self._fin_seq = self.seq_nr
+            self._close_deadline = time.monotonic() + FIN_TIMEOUT
+            self._queue_packet(ST_FIN)
+
+    # --- Receiving ---
+
+    def _on_packet(self, packet: UTPPacket) -> None:
+        if self.state == "closed":
+            self._on_packet_lingering(packet)
+            return
+        self._reply_micro = (_timestamp_us() - packet.timestamp) & TIMESTAMP_MASK
+        self.peer_window = packet.wnd_size
+
+        if packet.type == ST_RESET:
+            self._finish(ConnectionResetError(f"uTP connection reset by {self.addr}"))
+            return
+        if packet.type == ST_SYN:
+            self._send_state()  # Our reply to the SYN was lost
+            return
+        if self.state == "syn_sent":
+            if packet.type != ST_STATE:
+                return
+            self.ack_nr = (packet.seq_nr - 1) & SEQ_MASK
+            self.state = "connected"
+            if not self._connected.done():
+                self._connected.set_result(None)
+
+        self._process_ack(packet)
+        if packet.type in (ST_DATA, ST_FIN):
+            self._process_incoming(packet)
+        self._flush()
+
+        # The FIN is the last packet sent, so nothing in flight means it and
+        # all data before it have been acked.
+        if self._fin_seq is not None and not self._in_flight:
+            self._finish(None)
+
+    def _process_ack(self, packet: UTPPacket) -> None:
+        now = time.monotonic()
+        acked_bytes = 0
+        acked_packets = 0
+
+        def ack(seq_nr: int) -> None:
+            nonlocal acked_bytes, acked_packets
+            outgoing = self._in_flight.pop(seq_nr)
+            if not outgoing.need_resend:
+                self.cur_window -= len(outgoing.payload)
+            acked_bytes += len(outgoing.payload)
+            acked_packets += 1
+            if outgoing.transmissions == 1:
+                self._update_rtt(now - outgoing.sent_at)
+
+        for seq_nr in list(self._in_flight):
+            if _seq_diff(seq_nr, packet.ack_nr) > 0:
+                break
+            ack(seq_nr)
+
+        selectively_acked = []
+        if packet.selective_ack:
+            for bit in range(len(packet.selective_ack) * 8):
+                if packet.selective_ack[bit // 8] & (1 << (bit % 8)):
+                    seq_nr = (packet.ack_nr + 2 + bit) & SEQ_MASK
+                    selectively_acked.append(seq_nr)
+                    if seq_nr in self._in_flight:
+                        ack(seq_nr)
+
+        if acked_packets:
+            self._timeout_at = now + self.timeout if self._in_flight else None
+            if self._close_deadline is not None:
+                self._close_deadline = now + FIN_TIMEOUT  # Still making progress
+            if packet.timestamp_difference:
+                self._apply_ledbat(packet.timestamp_difference, acked_bytes, now)
+
+        lost = False
+        if (
+            packet.type == ST_STATE
+            and packet.ack_nr == self._last_ack_nr
+            and not packet.payload
+            and self._in_flight
+        ):
+            self._duplicate_acks += 1
+            if self._duplicate_acks == DUPLICATE_ACKS_BEFORE_RESEND:
+                lost |= self._fast_resend(next(iter(self._in_flight.values())))
+        elif packet.ack_nr != self._last_ack_nr:
+            self._duplicate_acks = 0
+        self._last_ack_nr = packet.ack_nr
+
+        for outgoing in list(self._in_flight.values()):
+            acked_after = sum(
+                1 for seq_nr in selectively_acked if _seq_diff(seq_nr, outgoing.seq_nr) > 0
+            )
+            if acked_after < DUPLICATE_ACKS_BEFORE_RESEND:
+                break
+            lost |= self._fast_resend(outgoing)
+
+        if lost:
+            self.max_window = max(MIN_WINDOW, self.max_window / 2)
+
+    def _fast_resend(self, outgoing: _OutgoingPacket) -> bool:
+        if outgoing.fast_resent or outgoing.need_resend:
+            return False
+        outgoing.fast_resent = True
+        self._transmit(outgoing)
+        return True
+
+    def _process_incoming(self, packet: UTPPacket) -> None:
+        distance = _seq_diff(packet.seq_nr, self.ack_nr)
+        if 0 < distance <= UTP_REORDER_LIMIT and (
+            self._eof_seq is None or _seq_diff(packet.seq_nr, self._eof_seq) <= 0
+        ):
+            if packet.type == ST_FIN:
+                self._eof_seq = packet.seq_nr
+            self._recv_buffer[packet.seq_nr] = packet.payload
+
+            while (self.ack_nr + 1) & SEQ_MASK in self._recv_buffer:
+                self.ack_nr = (self.ack_nr + 1) & SEQ_MASK
+                payload = self._recv_buffer.pop(self.ack_nr)
+                if payload:
+                    self._protocol.data_received(payload)
+                if self.ack_nr == self._eof_seq:
+                    self._eof_received = True
+                    self._recv_buffer.clear()
+                    self._protocol.eof_received()
+                    break
+        self._send_state()
+
+    def _selective_ack(self) -> Optional[bytes]:
+        """Builds the selective ACK bitmask for packets received past ack_nr + 1."""
+        if not self._recv_buffer:
+            return None
+        bits = [_seq_diff(seq_nr, self.ack_nr) - 2 for seq_nr in self._recv_buffer]
+        length = min(MAX_SELECTIVE_ACK_BYTES, (max(bits) // 32 + 1) * 4)
+        mask = bytearray(length)
+        for bit in bits:
+            if 0 <= bit < length * 8:
+                mask[bit // 8] |= 1 << (bit % 8)
+        return bytes(mask)
+
+    # --- Congestion control ---
+
+    def _update_rtt(self, sample: float) -> None:
+        if self.rtt is None:
+            self.rtt = sample
+            self.rtt_var = sample / 2
+        else:
+            delta = self.rtt - sample
+            self.rtt_var += (abs(delta) - self.rtt_var) / 4
+            self.rtt += (sample - self.rtt) / 8
+        self.timeout = max(self.rtt + self.rtt_var * 4, MIN_TIMEOUT)
+
+    def _apply_ledbat(self, delay: int, acked_bytes: int, now: float) -> None:
+        """
+        Grows or shrinks the congestion window by how far the measured one-way
+        queuing delay is from CCONTROL_TARGET_US (LEDBAT).
+        """
+        if not self._base_delays or now - self._base_delays[-1][0] >= BASE_DELAY_INTERVAL:
+            self._base_delays.append([now, delay])
+            if len(self._base_delays) > BASE_DELAY_HISTORY:
+                self._base_delays.popleft()
+        elif _timestamp_diff(delay, self._base_delays[-1][1]) < 0:
+            self._base_delays[-1][1] = delay
+
+        base_delay = self._base_delays[0][1]
+        for _, bucket_delay in self._base_delays:
+            if _timestamp_diff(bucket_delay, base_delay) < 0:
+                base_delay = bucket_delay
+
+        our_delay = max(0, _timestamp_diff(delay, base_delay))
+        delay_factor = (CCONTROL_TARGET_US - our_delay) / CCONTROL_TARGET_US
+        window_factor = acked_bytes / self.max_window
+        scaled_gain = MAX_CWND_INCREASE_BYTES_PER_RTT * delay_factor * window_factor
+        self.max_window = min(
+            float(UTP_RECV_WINDOW), max(float(MIN_WINDOW), self.max_window + scaled_gain)
+        )
+
+    def _on_tick(self, now: float) -> None:
+        if self.state == "closed":
+            if self._linger_deadline is not None and now >= self._linger_deadline:
+                self._endpoint.unregister(self)
+            return
+        if self._close_deadline is not None and now >= self._close_deadline:
+            self._finish(None)
+            return
+        if self._timeout_at is None or now < self._timeout_at or not self._in_flight:
+            return
+
+        oldest = next(iter(self._in_flight.values()))
+        if oldest.transmissions >= MAX_RETRANSMISSIONS:
+            self._finish(TimeoutError(f"uTP connection to {self.addr} timed out"))
+            return
+
+        # Everything in flight is presumed lost: restart from the minimum window.
+        self.max_window = float(MIN_WINDOW)
+        self.timeout = min(self.timeout * 2, 60.0)
+        self._timeout_at = None
+        for outgoing in self._in_flight.values():
+            if not outgoing.need_resend:
+                outgoing.need_resend = True
+                self.cur_window -= len(outgoing.payload)
+        self._flush()
+
+    def _on_packet_lingering(self, packet: UTPPacket) -> None:
+        """
+        Acks the peer's remaining data and FIN after we have closed, so the
+        peer can finish its own close. The data itself is discarded.
+        """
+        if packet.type not in (ST_DATA, ST_FIN):
+            if packet.type == ST_RESET:
+                self._endpoint.unregister(self)
+            return
+        if packet.seq_nr == (self.ack_nr + 1) & SEQ_MASK:
+            self.ack_nr = packet.seq_nr
+        self._send_packet(ST_STATE, self.seq_nr)
+        if packet.type == ST_FIN and packet.seq_nr == self.ack_nr:
+            self._endpoint.unregister(self)
+
+    def _finish(self, exc: Optional[Exception], linger: bool = True) -> None:
+        if self.state == "closed":
+            return
+        was_connected = self.state == "connected"
+        self.state = "closed"
+        self._closing = True
+        self._in_flight.clear()
+        self._recv_buffer.clear()
+        if linger and exc is None and was_connected and not self._eof_received:
+            # Like a TCP close: keep acking the peer until it closes too.
+            self._linger_deadline = time.monotonic() + FIN_TIMEOUT
+        else:
+            self._endpoint.unregister(self)
+        if not self._connected.done():
+            if exc is None:
+                self._connected.cancel()  # Closed by us while connecting
+            else:
+                self._connected.set_exception(exc)
+        self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+class UTPEndpoint(asyncio.DatagramProtocol):
+    """
+    A UDP socket carrying any number of uTP connections.
+
+    Connections are keyed by remote address and receive connection ID. When
+    'protocol_factory' is given, incoming SYNs are accepted as new connections.
+    'loss_rate' and 'delay' simulate a lossy, slow link for outgoing datagrams
+    (e.g. for testing over loopback); 'seed' makes the simulated loss repeatable.
+    """
+
+    def __init__(
+        self,
+        protocol_factory: Optional[Callable[[], asyncio.BaseProtocol]] = None,
+        loss_rate: float = 0.0,
+        delay: float = 0.0,
+        close_when_idle: bool = False,
+        seed: Optional[int] = None,
+    ):
+        self.protocol_factory = protocol_factory
+        self.loss_rate = loss_rate
+        self._loss_random = random.Random(seed)
+        self.delay = delay
+        self.close_when_idle = close_when_idle
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.connections: Dict[Tuple[Tuple[str, int], int], UTPConnection] = {}
+        self._tick_handle: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        self._tick_handle = asyncio.get_running_loop().call_later(
+            TICK_INTERVAL, self._tick
+        )
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self._tick_handle:
+            self._tick_handle.cancel()
+        for connection in list(self.connections.values()):
+            connection._finish(exc)
+
+    def error_received(self, exc: Exception) -> None:
+        print(f"uTP socket error: {exc}")
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        packet = decode_packet(data)
+        if packet is None:
+            return
+        addr = addr[:2]
+
+        if packet.type == ST_SYN:
+            key = (addr, (packet.connection_id + 1) & SEQ_MASK)
+            if key in self.connections:
+                self.connections[key]._on_packet(packet)
+            elif self.protocol_factory is not None:
+                self._accept(packet, addr)
+            return
+
+        connection = self.connections.get((addr, packet.connection_id))
+        if connection is not None:
+            connection._on_packet(packet)
+
+    def send_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if self.loss_rate and self._loss_random.random() < self.loss_rate:
+            return
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self._sendto, data, addr)
+        else:
+            self._sendto(data, addr)
+
+    def _sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(data, addr)
+
+    def _accept(self, syn: UTPPacket, addr: Tuple[str, int]) -> None:
+        connection = UTPConnection(
+            self,
+            addr,
+            recv_id=(syn.connection_id + 1) & SEQ_MASK,
+            send_id=syn.connection_id,
+            seq_nr=random.randrange(1, SEQ_MASK),
+            protocol=self.protocol_factory(),
+        )
+        connection.ack_nr = syn.seq_nr
+        connection.state = "connected"
+        connection._connected.set_result(None)
+        self.connections[(addr, connection.recv_id)] = connection
+        connection._on_packet(syn)  # Records the timestamp and sends the SYN's ACK
+        connection.get_protocol().connection_made(connection)
+
+    def connect(
+        self, addr: Tuple[str, int], protocol: asyncio.BaseProtocol
+    ) -> UTPConnection:
+        """
+        Starts a uTP connection to 'addr' by sending a SYN.
+        """
+        recv_id = random.randrange(SEQ_MASK)
+        while (addr, recv_id) in self.connections:
+            recv_id = random.randrange(SEQ_MASK)
+        connection = UTPConnection(
+            self, addr, recv_id, (recv_id + 1) & SEQ_MASK, seq_nr=1, protocol=protocol
+        )
+        self.connections[(addr, recv_id)] = connection
+        protocol.connection_made(connection)
+        connection._queue_packet(ST_SYN)
+        return connection
+
+    def unregister(self, connection: UTPConnection) -> None:
+        self.connections.pop((connection.addr, connection.recv_id), None)
+        if self.close_when_idle and not self.connections and self.transport:
+            self.transport.close()
+
+    def close(self) -> None:
+        """Aborts all connections and closes the UDP socket."""
+        for connection in list(self.connections.values()):
+            connection.abort()
+        if self.transport is not None:
+            self.transport.close()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        for connection in list(self.connections.values()):
+            connection._on_tick(now)
+        self._tick_handle = asyncio.get_running_loop().call_later(
+            TICK_INTERVAL, self._tick
+        )
+
+
+async def open_utp_connection(
+    host: str,
+    port: int,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    loss_rate: float = 0.0,
+    delay: float = 0.0,
+    seed: Optional[int] = None,
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """
+    Opens a uTP connection, the uTP counterpart of asyncio.open_connection().
+
+    Args:
+        host: The IP address or host name of the peer.
+        port: The UDP port of the peer.
+        connect_timeout: Timeout in seconds for the peer to answer the SYN.
+                         Defaults to CONNECT_TIMEOUT.
+        loss_rate: Fraction of outgoing datagrams to drop (for testing).
+        delay: Seconds to delay each outgoing datagram by (for testing).
+        seed: Seed for the simulated loss (for testing).
+
+    Returns:
+        A tuple containing the asyncio StreamReader and StreamWriter objects
+        of the connection.
+
+    Raises:
+        asyncio.TimeoutError: If the peer does not answer within 'connect_timeout'.
+        ConnectionResetError: If the peer refuses the connection.
+    """
+    loop = asyncio.get_running_loop()
+    addr_info = await loop.getaddrinfo(
+        host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM
+    )
+    addr = addr_info[0][4][:2]
+    _, endpoint = await loop.create_datagram_endpoint(
+        lambda: UTPEndpoint(
+            loss_rate=loss_rate, delay=delay, close_when_idle=True, seed=seed
+        ),
+        local_addr=("0.0.0.0", 0),
+    )
+
+    reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    connection = endpoint.connect(addr, protocol)
+    try:
+        await asyncio.wait_for(connection.wait_connected(), connect_timeout)
+    except BaseException:
+        connection.abort()
+        raise
+    writer = asyncio.StreamWriter(connection, protocol, reader, loop)
+    return reader, writer
+
+
+async def start_utp_server(
+    client_connected_cb: Callable,
+    host: str,
+    port: int,
+    loss_rate: float = 0.0,
+    delay: float = 0.0,
+    seed: Optional[int] = None,
+) -> UTPEndpoint:
+    """
+    Accepts uTP connections, the uTP counterpart of asyncio.start_server().
+
+    'client_connected_cb' is called with a (reader, writer) pair for every
+    accepted connection and may be a coroutine function. 'loss_rate', 'delay'
+    and 'seed' simulate a lossy link as in open_utp_connection().
+
+    Returns:
+        The listening UTPEndpoint; call its close() method to stop the server.
+    """
+    loop = asyncio.get_running_loop()
+
+    def protocol_factory() -> asyncio.StreamReaderProtocol:
+        return asyncio.StreamReaderProtocol(asyncio.StreamReader(), client_connected_cb)
+
+    _, endpoint = await loop.create_datagram_endpoint(
+        lambda: UTPEndpoint(
+            protocol_factory, loss_rate=loss_rate, delay=delay, seed=seed
+        ),
+        local_addr=(host, port),
+    )
+    return endpoint
+
+
+async def main():
+    """
+    Main function to send data over uTP on loopback with simulated delay and loss.
+    """
+    payload_size = 524288
+    loss_rate = 0.05
+    delay = 0.02
+
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        data = await reader.readexactly(payload_size)
+        writer.write(hashlib.sha1(data).digest())
+        await writer.drain()
+        writer.close()
+
+    server = await start_utp_server(
+        handle_client, "127.0.0.1", 0, loss_rate=loss_rate, delay=delay
+    )
+    server_port = server.transport.get_extra_info("sockname")[1]
+    payload = os.urandom(payload_size)
+
+    started = time.monotonic()
+    reader, writer = await open_utp_connection(
+        "127.0.0.1", server_port, loss_rate=loss_rate, delay=delay
+    )
+    writer.write(payload)
+    await writer.drain()
+    digest = await asyncio.wait_for(reader.readexactly(20), 60)
+    elapsed = time.monotonic() - started
+    writer.close()
+    await writer.wait_closed()
+    server.close()
+
+    if digest == hashlib.sha1(payload).digest():
+        print(
+            f"Sent {payload_size} bytes over uTP in {elapsed:.2f} seconds "
+            f"({loss_rate:.0%} loss, {delay * 1000:.0f} ms delay each way)."
+        )
+    else:
+        print("uTP transfer corrupted: digest mismatch.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())